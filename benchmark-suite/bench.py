@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 import os
 import copy
+import json
 import requests
 import click
 
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_questions.jsonl")
+
 vllm_bench_serve_template = \
 """ 
 vllm bench serve \\\n\
@@ -99,6 +102,90 @@ def flood_testing(config: BenchmarkConfig, **kwargs):
     inner_config.add_new_arguments(**kwargs)
     print(inner_config.get_command())
 
+@bench.command("rag")
+@click.option("--mode", type=click.Choice(["rag", "agent"]), default="rag", help="Replay questions through RAG or the agent loop")
+@click.option("--questions", type=click.Path(exists=True), default=DEFAULT_QUESTIONS, help="Question set (JSONL or one question per line)")
+@click.option("--repo", type=str, multiple=True, help="Repository URL or local git path; overrides the repos in the question set")
+@click.option("--concurrency", type=int, default=8, help="Number of requests in flight")
+@click.option("--max-actions", type=int, default=5, help="Max tool calls per agent request")
+@click.option("--api-key", type=str, default=None, help="API key for the endpoint (defaults to $OPENAI_API_KEY)")
+@click.option("--stub", is_flag=True, help="Run fully offline against a local stand-in embedding/LLM endpoint")
+@click.option("--result-file", type=click.Path(), default=None, help="Save the summary as JSON")
+@click.pass_obj
+def rag_testing(config: BenchmarkConfig, mode, questions, repo, concurrency, max_actions, api_key, stub, result_file):
+    """
+    Replay a question set against rag_answer/rag_answer_multi or the agent
+    loop and report per-stage latency breakdowns.  Uses --num-prompts
+    requests, cycling through the question set.
+    """
+    base_url = config.base_url
+    if stub:
+        from stub_server import start_stub_server, MODEL_NAME
+        server = start_stub_server()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        os.environ.setdefault("RAG_EMBEDDING_MODEL", MODEL_NAME)
+        model_name = MODEL_NAME
+        if not repo:
+            # Index this checkout instead of cloning from the network
+            repo = (os.path.dirname(os.path.dirname(os.path.abspath(__file__))),)
+    else:
+        model_name = fetch_model_name(base_url)
+
+    # rag.py reads these when it is imported, so set them first
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = api_key or os.environ.get("OPENAI_API_KEY", "ec528")
+    os.environ["RAG_CHAT_MODEL"] = model_name
+
+    import rag_bench
+
+    items = rag_bench.load_questions(questions, repo)
+    index_stages = None
+    if mode == "rag":
+        print("Building indexes...")
+        index_stages = rag_bench.build_indexes(items)
+        func = rag_bench.run_rag
+    else:
+        func = rag_bench.AgentRunner(base_url, os.environ["OPENAI_API_KEY"], max_actions)
+
+    print(f"Running {config.num_prompts} {mode} requests at concurrency {concurrency} against {base_url}")
+    results, duration = rag_bench.run_workload(items, func, config.num_prompts, concurrency)
+    summary = rag_bench.summarize(mode, results, duration, concurrency, index_stages)
+    rag_bench.print_report(summary)
+
+    if result_file:
+        with open(result_file, "w") as f:
+            json.dump(summary, f, indent=2)
+
+@bench.command("startup")
+@click.option("--runs", type=int, default=3, help="Number of cold starts to measure")
+@click.option("--timeout", type=float, default=60.0, help="Seconds to wait for each start")
+@click.option("--max-live-seconds", type=float, default=None, help="Fail if the median time to live exceeds this")
+@click.option("--max-ready-seconds", type=float, default=None, help="Fail if the median time to ready exceeds this")
+def startup_testing(runs, timeout, max_live_seconds, max_ready_seconds):
+    """
+    Measure WebChat cold start (time until /healthz and /readyz succeed)
+    against the local stand-in model server.
+    """
+    from stub_server import start_stub_server
+    import startup_bench
+
+    server = start_stub_server()
+    model_host_port = f"127.0.0.1:{server.server_address[1]}"
+
+    results = [startup_bench.measure_startup(model_host_port, timeout) for _ in range(runs)]
+    startup_bench.print_report(results)
+
+    live_times = sorted(l for l, _ in results if l is not None)
+    ready_times = sorted(r for _, r in results if r is not None)
+    if len(ready_times) < runs:
+        raise click.ClickException("WebChat did not become ready within the timeout")
+    live_median = live_times[len(live_times) // 2]
+    ready_median = ready_times[len(ready_times) // 2]
+    if max_live_seconds is not None and live_median > max_live_seconds:
+        raise click.ClickException(f"Median time to live {live_median:.3f}s exceeds {max_live_seconds}s")
+    if max_ready_seconds is not None and ready_median > max_ready_seconds:
+        raise click.ClickException(f"Median time to ready {ready_median:.3f}s exceeds {max_ready_seconds}s")
+
 if __name__=="__main__":
     bench()
 
@@ -0,0 +1,249 @@
+"""
+RAG and agent workload benchmark.
+
+Replays a question set against the WebChat RAG pipeline (rag_answer /
+rag_answer_multi) or a ReAct-style agent loop over the WebChat model and
+tools, at a fixed concurrency.  Per-stage timings come from the WebChat
+telemetry spans collected for each request.
+"""
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+WEBCHAT_DIR = Path(__file__).resolve().parent.parent / "chatbotbasic" / "WebChat"
+
+# Stages reported for each mode, in pipeline order.  Anything else recorded
+# by the telemetry spans is listed after these.
+RAG_STAGES = ["rag.embed_query", "rag.search", "rag.context", "rag.prefill", "rag.decode"]
+AGENT_STAGES = ["model.generate", "agent.prefill", "agent.decode", "tool"]
+INDEX_STAGES = ["rag.clone", "rag.load_index", "rag.load_docs", "rag.chunk", "rag.embed", "rag.save_index", "rag.merge"]
+
+AGENT_INSTRUCTIONS = """
+Available tools:
+{tools}
+To use a tool, reply with a Thought and an Action, for example:
+Thought: I need to compute this.
+Action: Calculate[ 2 + 2 ]
+Then wait for the Result before writing the Conclusion.
+"""
+
+_ACTION = re.compile(r"Action:\s*(\w+)\s*\[(.*?)\]", re.S)
+
+
+def _import_webchat():
+    if str(WEBCHAT_DIR) not in sys.path:
+        sys.path.insert(0, str(WEBCHAT_DIR))
+    import telemetry
+    return telemetry
+
+
+def load_questions(path, repos=None):
+    """
+    Load a question set.  Each line is either a JSON object with "question"
+    and optional "repos" keys, or a plain-text question.  repos, if given,
+    replaces the repos of every question.
+    """
+    items = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+            else:
+                item = {"question": line}
+            if repos:
+                item["repos"] = list(repos)
+            items.append(item)
+    if not items:
+        raise ValueError(f"No questions found in {path}")
+    return items
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _stage_totals(spans):
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return totals
+
+
+def build_indexes(items):
+    """
+    Clone and index every repo (or repo set) used by the question set, so
+    the timed run measures queries against warm indexes.  Returns the
+    indexing stage totals.
+    """
+    telemetry = _import_webchat()
+    import rag
+
+    with telemetry.trace() as spans:
+        for repos in sorted({tuple(item.get("repos", [])) for item in items}):
+            if len(repos) == 1:
+                rag.build_retriever_for_repo(repos[0])
+            elif repos:
+                rag.build_retriever_for_repos(repos)
+    return _stage_totals(spans)
+
+
+def run_rag(item):
+    import rag
+
+    repos = item.get("repos", [])
+    if len(repos) == 1:
+        return rag.rag_answer(repos[0], item["question"])
+    return rag.rag_answer_multi(repos, item["question"])
+
+
+class AgentRunner:
+    """
+    ReAct loop over the WebChat model and tools: stream a completion, run
+    the tool named in its Action line, feed back the Result, and repeat
+    until the model answers without an action or max_actions is reached.
+    """
+
+    def __init__(self, base_url, api_key, max_actions):
+        telemetry = _import_webchat()
+        from models import OpenAIModel
+        from tools import Tools
+
+        self.telemetry = telemetry
+        self.model = OpenAIModel({"base_url": base_url, "api_key": api_key})
+        # Discover the model up front so it is not timed as part of a request
+        self.model.discover_model(retries=3)
+        self.tools = Tools()
+        self.tools.set_browser(None)  # plain HTTP requests, no Selenium
+        self.max_actions = max_actions
+
+        with open(WEBCHAT_DIR / "prompt.txt") as f:
+            self.system_message = f.read() + AGENT_INSTRUCTIONS.format(tools=self.tools.get_tool_list_for_prompt())
+
+    def __call__(self, item):
+        prompt = item["question"]
+        history = []
+        completion = ""
+
+        for _ in range(self.max_actions + 1):
+            # model.generate is reported as its own stage (request sent to
+            # response headers), so prefill only counts the wait after it.
+            stream = self.model.generate(self.system_message, prompt, history=history, temperature=0)
+            start = time.perf_counter()
+            first_token = None
+            parts = []
+            for chunk in stream:
+                text = self.model.parse_completion(chunk)
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        self.telemetry.observe_stage("agent.prefill", first_token - start)
+                    parts.append(text)
+            if first_token is not None:
+                self.telemetry.observe_stage("agent.decode", time.perf_counter() - first_token)
+
+            completion = "".join(parts)
+            match = _ACTION.search(completion)
+            if not match:
+                break
+
+            result = self.tools.run_tool(match.group(1), match.group(2).strip())
+            history.append((prompt, completion))
+            prompt = f"Result: {result}"
+
+        return completion
+
+
+def run_workload(items, func, num_requests, concurrency):
+    """
+    Run func over num_requests questions (cycling through items) with
+    concurrency requests in flight.  Returns (results, wall time).
+    """
+    telemetry = _import_webchat()
+
+    def one(i):
+        item = items[i % len(items)]
+        start = time.perf_counter()
+        error = None
+        with telemetry.trace() as spans:
+            try:
+                func(item)
+            except Exception as e:
+                error = str(e)
+        return {
+            "latency": time.perf_counter() - start,
+            "stages": _stage_totals(spans),
+            "error": error,
+        }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(num_requests)))
+    return results, time.perf_counter() - start
+
+
+def summarize(mode, results, duration, concurrency, index_stages=None):
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["latency"] for r in ok]
+
+    order = RAG_STAGES if mode == "rag" else AGENT_STAGES
+    seen = {name for r in ok for name in r["stages"]}
+    names = [s for s in order if s in seen] + sorted(seen - set(order))
+
+    def stats(values):
+        return {
+            "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+            "p50_ms": 1000 * percentile(values, 50),
+            "p90_ms": 1000 * percentile(values, 90),
+            "p99_ms": 1000 * percentile(values, 99),
+        }
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "completed": len(ok),
+        "failed": len(results) - len(ok),
+        "errors": sorted({r["error"] for r in results if r["error"]})[:5],
+        "duration": duration,
+        "request_throughput": len(ok) / duration if duration else 0.0,
+        "e2e": stats(latencies),
+        "stages": {name: stats([r["stages"].get(name, 0.0) for r in ok]) for name in names},
+        "index_stages_ms": {k: 1000 * v for k, v in (index_stages or {}).items()},
+    }
+
+
+def print_report(summary):
+    print("{s:{c}^60}".format(s=f" {summary['mode'].upper()} Benchmark Result ", c="="))
+    print("{:<40} {:<10}".format("Concurrency:", summary["concurrency"]))
+    print("{:<40} {:<10}".format("Successful requests:", summary["completed"]))
+    print("{:<40} {:<10}".format("Failed requests:", summary["failed"]))
+    print("{:<40} {:<10.2f}".format("Benchmark duration (s):", summary["duration"]))
+    print("{:<40} {:<10.2f}".format("Request throughput (req/s):", summary["request_throughput"]))
+    for error in summary["errors"]:
+        print(f"  error: {error}")
+
+    if summary["index_stages_ms"]:
+        print("{s:{c}^60}".format(s=" Indexing (one-off, ms) ", c="-"))
+        for name in INDEX_STAGES:
+            if name in summary["index_stages_ms"]:
+                print("{:<40} {:<10.2f}".format(name, summary["index_stages_ms"][name]))
+
+    print("{s:{c}^60}".format(s=" Per-request latency (ms) ", c="-"))
+    print("{:<24} {:>8} {:>8} {:>8} {:>8}".format("stage", "mean", "p50", "p90", "p99"))
+    rows = list(summary["stages"].items()) + [("end-to-end", summary["e2e"])]
+    for name, s in rows:
+        print("{:<24} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+            name, s["mean_ms"], s["p50_ms"], s["p90_ms"], s["p99_ms"]))
+    print("=" * 60)
@@ -0,0 +1,109 @@
+"""
+WebChat cold-start benchmark.
+
+Launches app.py against the stand-in model server and measures how long the
+process takes to answer its liveness (/healthz) and readiness (/readyz)
+probes.  Each run uses a fresh interpreter, so imports are measured cold.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import yaml
+
+WEBCHAT_DIR = Path(__file__).resolve().parent.parent / "chatbotbasic" / "WebChat"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def _prepare_workdir(model_host_port, metrics_port):
+    """
+    app.py reads config.yaml and prompt.txt from its working directory, so
+    give it a scratch copy pointing at the stand-in server.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="webchat_startup_"))
+    shutil.copy(WEBCHAT_DIR / "prompt.txt", workdir / "prompt.txt")
+
+    with open(WEBCHAT_DIR / "config.yaml") as f:
+        config = yaml.safe_load(f)
+    config["openstack_ip_port"] = model_host_port
+    config["metrics_port"] = metrics_port
+    config["verbose"] = False
+    with open(workdir / "config.yaml", "w") as f:
+        yaml.safe_dump(config, f)
+    return workdir
+
+
+def measure_startup(model_host_port, timeout=60.0):
+    """
+    Start app.py once and return (seconds until live, seconds until ready).
+    Either value is None if it was not reached within timeout.
+    """
+    metrics_port = _free_port()
+    workdir = _prepare_workdir(model_host_port, metrics_port)
+    env = dict(os.environ, GRADIO_SERVER_PORT=str(_free_port()), GRADIO_ANALYTICS_ENABLED="False")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(WEBCHAT_DIR / "app.py")],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    live = ready = None
+    base = f"http://127.0.0.1:{metrics_port}"
+    try:
+        while time.perf_counter() - start < timeout and process.poll() is None:
+            if live is None and _status(base + "/healthz") == 200:
+                live = time.perf_counter() - start
+            if live is not None and _status(base + "/readyz") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return live, ready
+
+
+def print_report(runs):
+    def fmt(value):
+        return f"{value:.3f}" if value is not None else "timeout"
+
+    print("{s:{c}^60}".format(s=" WebChat Startup Result ", c="="))
+    print("{:<10} {:>20} {:>20}".format("run", "live (s)", "ready (s)"))
+    for i, (live, ready) in enumerate(runs):
+        print("{:<10} {:>20} {:>20}".format(i, fmt(live), fmt(ready)))
+
+    live_times = sorted(l for l, _ in runs if l is not None)
+    if live_times:
+        print("{:<40} {:<10.3f}".format("Median time to live (s):", live_times[len(live_times) // 2]))
+    ready_times = sorted(r for _, r in runs if r is not None)
+    if ready_times:
+        print("{:<40} {:<10.3f}".format("Median time to ready (s):", ready_times[len(ready_times) // 2]))
+    print("=" * 60)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Stand-in for an OpenAI-compatible server, so the RAG and agent benchmarks can
+run fully offline.  Serves /v1/models, /v1/embeddings and /v1/chat/completions
+(streaming and non-streaming).  Embeddings are deterministic hashed
+bag-of-words vectors, so retrieval still returns relevant chunks, and chat
+responses simulate prefill and decode time proportional to the prompt and
+output length.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+MODEL_NAME = "stub-model"
+EMBEDDING_DIM = 256
+
+_WORD = re.compile(r"\w+")
+
+
+def embed(text):
+    """
+    Hash each word into one of EMBEDDING_DIM buckets and L2-normalize.
+    """
+    vector = [0.0] * EMBEDDING_DIM
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def count_tokens(text):
+    # Roughly one token per word or punctuation mark
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def reply_for(messages, output_tokens):
+    """
+    Pick the response text.  Agent prompts (which describe tools with
+    "Action:") get one Calculate action before answering, so the tool-call
+    path is exercised too.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    last = messages[-1]["content"] if messages else ""
+    if "Action:" in system and "Result:" not in last:
+        return "Thought: I should work this out step by step.\nAction: Calculate[ (17 * 23) + 4 ** 3 ]"
+
+    words = ["Conclusion:"] + ["token"] * max(output_tokens - 1, 0)
+    return " ".join(words)
+
+
+class StubConfig:
+    def __init__(self, prefill_ms_per_token, decode_ms_per_token, output_tokens):
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self.output_tokens = output_tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    config = StubConfig(0.05, 5.0, 64)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": MODEL_NAME, "object": "model", "owned_by": "stub"}]})
+        elif self.path in ("/health", "/metrics"):
+            self._send_json({})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if path == "/v1/embeddings":
+            self._embeddings(self._read_json())
+        elif path == "/v1/chat/completions":
+            self._chat(self._read_json())
+        else:
+            self.send_error(404)
+
+    def _embeddings(self, request):
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        tokens = 0
+        for i, text in enumerate(inputs):
+            if not isinstance(text, str):
+                # Pre-tokenized input; hash the token ids instead
+                text = " ".join(str(t) for t in text)
+            tokens += count_tokens(text)
+            data.append({"object": "embedding", "index": i, "embedding": embed(text)})
+        self._send_json({
+            "object": "list",
+            "data": data,
+            "model": request.get("model", MODEL_NAME),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, request):
+        messages = request.get("messages", [])
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        output_tokens = min(request.get("max_tokens") or self.config.output_tokens, self.config.output_tokens)
+        text = reply_for(messages, output_tokens)
+        pieces = re.findall(r"\S+\s*", text)
+
+        prefill_seconds = prompt_tokens * self.config.prefill_ms_per_token / 1000
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = request.get("model", MODEL_NAME)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces),
+        }
+
+        if not request.get("stream"):
+            time.sleep(prefill_seconds + len(pieces) * self.config.decode_ms_per_token / 1000)
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        # Like vLLM, send the headers right away and spend the prefill time
+        # before the first token
+        self.wfile.flush()
+        time.sleep(prefill_seconds)
+
+        def send_chunk(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, piece in enumerate(pieces):
+            if i > 0:
+                time.sleep(self.config.decode_ms_per_token / 1000)
+            delta = {"content": piece}
+            if i == 0:
+                delta["role"] = "assistant"
+            send_chunk(delta)
+        send_chunk({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_stub_server(host="127.0.0.1", port=0, prefill_ms_per_token=0.05,
+                      decode_ms_per_token=5.0, output_tokens=64):
+    """
+    Start the stand-in server on a background thread.  Pass port=0 to pick a
+    free port; the bound address is available as server.server_address.
+    """
+    handler = type("Handler", (_Handler,), {
+        "config": StubConfig(prefill_ms_per_token, decode_ms_per_token, output_tokens)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="stub-server", daemon=True)
+    thread.start()
+    return server
+
+
+@click.command()
+@click.option("--host", type=str, default="127.0.0.1", help="Address to bind")
+@click.option("--port", type=int, default=8000, help="Port to bind")
+@click.option("--prefill-ms-per-token", type=float, default=0.05, help="Simulated prefill time per prompt token")
+@click.option("--decode-ms-per-token", type=float, default=5.0, help="Simulated decode time per output token")
+@click.option("--output-tokens", type=int, default=64, help="Tokens generated per chat completion")
+def main(host, port, prefill_ms_per_token, decode_ms_per_token, output_tokens):
+    server = start_stub_server(host, port, prefill_ms_per_token, decode_ms_per_token, output_tokens)
+    print(f"Stub OpenAI-compatible server listening on http://{host}:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+import telemetry
+
+# Priority classes, from most to least latency sensitive.  The weight is the
+# share of dispatch slots a backlogged user of that class gets relative to
+# the others under weighted fair queuing.  The app's controller only sees
+# chats (INTERACTIVE).  batch.py runs as its own process with its own BATCH
+# controller, which backs off at lower vLLM load than the app's, so bulk
+# jobs yield to chats.  RAG indexing is not wired into the app, so RAG_INDEX
+# is reserved for when it is.
+INTERACTIVE = "interactive"
+RAG_INDEX = "rag_index"
+BATCH = "batch"
+
+DEFAULT_WEIGHTS = {
+    INTERACTIVE: 8,
+    RAG_INDEX: 2,
+    BATCH: 1,
+}
+
+# Names differ between vLLM releases; the first one present is used
+_WAITING_METRICS = ["vllm:num_requests_waiting"]
+_KV_USAGE_METRICS = ["vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc"]
+
+
+class Busy(Exception):
+    """
+    Raised when a request is shed instead of being queued.
+    """
+
+
+class _Waiter:
+    __slots__ = ["session", "priority", "granted", "cancelled"]
+
+    def __init__(self, session, priority):
+        self.session = session
+        self.priority = priority
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """
+    Admission scheduler in front of the model server.
+
+    At most `limit` requests are in flight to vLLM at once.  Requests beyond
+    that wait in a weighted fair queue keyed by (session, priority), so one
+    busy user cannot starve the others, and classes with a higher weight
+    are dispatched ahead of lower ones.  Requests are shed with Busy when the
+    session is already at max_per_session, when the queue is full, or when
+    they wait longer than queue_timeout.
+
+    The limit follows vLLM's own load (see update_load): it is halved while
+    vLLM reports a long waiting queue or a nearly full KV cache, and grows
+    back by one per healthy poll, up to max_inflight.
+    """
+
+    def __init__(self, max_inflight=32, min_inflight=4, max_queue=128, max_per_session=2,
+                 queue_timeout=10.0, vllm_max_waiting=8, kv_cache_high=0.9, weights=None):
+        self.max_inflight = max_inflight
+        self.min_inflight = min_inflight
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.queue_timeout = queue_timeout
+        self.vllm_max_waiting = vllm_max_waiting
+        self.kv_cache_high = kv_cache_high
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+        self.limit = max_inflight
+        self.inflight = 0
+        self._queued = 0
+        self._sessions = {}          # session -> running + queued requests
+        self._heap = []              # (finish tag, seq, waiter)
+        self._finish = {}            # (session, priority) -> last finish tag
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        telemetry.ADMISSION_LIMIT.set(self.limit)
+
+    @property
+    def capacity(self):
+        """
+        Most requests that can be inside admit() at once, running or queued.
+        A thread pool in front of the controller needs more workers than this,
+        or the overflow waits in the pool, where it is never shed.
+        """
+        return self.max_inflight + self.max_queue
+
+    @contextmanager
+    def admit(self, session, priority=INTERACTIVE):
+        """
+        Hold a dispatch slot for the enclosed block, waiting in the fair
+        queue if needed.  Raises Busy if the request is shed.
+        """
+        start = time.perf_counter()
+        self._acquire(session, priority)
+        telemetry.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, priority=priority)
+        try:
+            yield
+        finally:
+            self._release(session)
+
+    def _shed(self, reason, priority):
+        telemetry.ADMISSION_SHED.inc(reason=reason, priority=priority)
+        raise Busy(reason)
+
+    def _acquire(self, session, priority):
+        weight = self.weights.get(priority, 1)
+
+        with self._cond:
+            if self._sessions.get(session, 0) >= self.max_per_session:
+                self._shed("session_limit", priority)
+
+            if self.inflight < self.limit and not self._queued:
+                self._grant(session)
+                return
+
+            if self._queued >= self.max_queue:
+                self._shed("queue_full", priority)
+
+            # Self-clocked fair queuing: a flow's next request finishes 1/weight
+            # after its previous one, but never starts before the current
+            # virtual time, so idle flows do not bank credit.
+            key = (session, priority)
+            tag = max(self._virtual_time, self._finish.get(key, 0.0)) + 1.0 / weight
+            self._finish[key] = tag
+
+            waiter = _Waiter(session, priority)
+            heapq.heappush(self._heap, (tag, next(self._seq), waiter))
+            self._queued += 1
+            self._sessions[session] = self._sessions.get(session, 0) + 1
+            telemetry.ADMISSION_QUEUED.inc(priority=priority)
+
+            # queue_timeout=None waits as long as it takes
+            deadline = None if self.queue_timeout is None else time.monotonic() + self.queue_timeout
+            while not waiter.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    waiter.cancelled = True
+                    self._queued -= 1
+                    self._session_done(session)
+                    telemetry.ADMISSION_QUEUED.dec(priority=priority)
+                    self._shed("timeout", priority)
+                self._cond.wait(remaining)
+
+    def _grant(self, session):
+        self.inflight += 1
+        self._sessions[session] = self._sessions.get(session, 0) + 1
+        telemetry.ADMISSION_INFLIGHT.set(self.inflight)
+
+    def _session_done(self, session):
+        count = self._sessions.get(session, 0) - 1
+        if count > 0:
+            self._sessions[session] = count
+        else:
+            self._sessions.pop(session, None)
+
+    def _release(self, session):
+        with self._cond:
+            self.inflight -= 1
+            self._session_done(session)
+            telemetry.ADMISSION_INFLIGHT.set(self.inflight)
+            self._dispatch()
+
+    def _dispatch(self):
+        """
+        Grant queued requests in finish-tag order while there is capacity.
+        Must be called with the lock held.
+        """
+        granted = False
+        while self._heap and self.inflight < self.limit:
+            tag, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            self._virtual_time = tag
+            self._queued -= 1
+            # The session count already includes this request
+            self.inflight += 1
+            waiter.granted = True
+            granted = True
+            telemetry.ADMISSION_QUEUED.dec(priority=waiter.priority)
+
+        if granted:
+            telemetry.ADMISSION_INFLIGHT.set(self.inflight)
+            self._cond.notify_all()
+
+        if not self._heap:
+            # Nothing is backlogged, so old finish tags can no longer matter
+            self._finish.clear()
+
+    def update_load(self, waiting, kv_usage):
+        """
+        Adjust the in-flight limit from vLLM's queue depth and KV-cache usage
+        (AIMD: halve when overloaded, otherwise grow by one).
+        """
+        overloaded = ((waiting is not None and waiting > self.vllm_max_waiting) or
+                      (kv_usage is not None and kv_usage >= self.kv_cache_high))
+
+        with self._cond:
+            if overloaded:
+                self.limit = max(self.min_inflight, self.limit // 2)
+            else:
+                self.limit = min(self.max_inflight, self.limit + 1)
+            telemetry.ADMISSION_LIMIT.set(self.limit)
+            self._dispatch()
+
+    def start_polling(self, metrics_url, interval=1.0):
+        """
+        Scrape vLLM's /metrics every interval seconds on a background thread
+        and feed the result to update_load.  Scrape failures leave the limit
+        unchanged.
+        """
+        import requests
+
+        def poll():
+            while True:
+                try:
+                    response = requests.get(metrics_url, timeout=interval)
+                    response.raise_for_status()
+                    self.update_load(*parse_vllm_metrics(response.text))
+                except Exception:
+                    telemetry.ERRORS.inc(stage="admission.poll")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=poll, name="admission-poll", daemon=True)
+        thread.start()
+        return thread
+
+
+def parse_vllm_metrics(text):
+    """
+    Return (requests waiting, KV-cache usage fraction) from vLLM's Prometheus
+    metrics.  With several engines the waiting counts are summed and the
+    fullest KV cache is reported.  Either value is None if missing.
+    """
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_and_labels, _, value = line.rpartition(" ")
+        name = name_and_labels.split("{", 1)[0]
+        try:
+            values.setdefault(name, []).append(float(value))
+        except ValueError:
+            continue
+
+    def first(names, combine):
+        for name in names:
+            if name in values:
+                return combine(values[name])
+        return None
+
+    return first(_WAITING_METRICS, sum), first(_KV_USAGE_METRICS, max)
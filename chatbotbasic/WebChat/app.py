@@ -1,30 +1,62 @@
 import re
+import time
+import threading
 import datetime
-import gradio as gr
 import yaml
 
+import telemetry
+from admission import AdmissionController, Busy, INTERACTIVE
 from models import OpenAIModel
-from tools import Tools
 
 SYSTEM_MESSAGE_TEMPLATE = "prompt.txt"
 
+BUSY_MESSAGE = "The server is busy right now. Please try again in a moment."
+NOT_READY_MESSAGE = "The model server is still starting up. Please try again in a moment."
+
+SHED_HEADROOM = 16  # Chats Gradio runs beyond admission capacity, so they reach the controller and are shed
+UI_THREADS = 8      # Gradio worker threads kept free for non-chat event handlers
+
 with open("config.yaml", "r") as config_file:
     config = yaml.safe_load(config_file)
 
 # synthesize the base_url
 config["base_url"] = f"http://{config.get('openstack_ip_port', '127.0.0.1:8000')}/v1"
 
+telemetry.start_metrics_server(config.get("metrics_port", 9100))
+
+# Set once the Gradio server is accepting requests.  Registered first so
+# /readyz stays pending until then, however quickly discovery finishes.
+gradio_running = threading.Event()
+telemetry.add_readiness_check("gradio", gradio_running.is_set)
+
 MODELS = {
     "vLLM": OpenAIModel(config)
 }
 
+# Model discovery runs in the background and retries until vLLM answers;
+# the pod reports ready on /readyz once it has succeeded.
+MODELS["vLLM"].start_discovery()
+telemetry.add_readiness_check("model", lambda: MODELS["vLLM"].ready)
+
+# Gradio takes seconds to import.  Importing it only now lets liveness probes
+# succeed and model discovery run while it loads.
+import gradio as gr
+
 verbose = config["verbose"]
 description = config["description"]
 examples = config["examples"]
 temperature = config["temperature"]
 max_actions = config["max_actions"]
 
-llm_tools = Tools()
+if config.get("otel_endpoint"):
+    telemetry.enable_otel(config["otel_endpoint"])
+
+# Admission control in front of vLLM.  The in-flight limit tracks vLLM's
+# queue depth and KV-cache usage, scraped from its /metrics endpoint.
+admission_config = dict(config.get("admission", {}))
+poll_interval = admission_config.pop("poll_interval", 1.0)
+admission = AdmissionController(**admission_config)
+admission.start_polling(config["base_url"].rsplit("/v1", 1)[0] + "/metrics", poll_interval)
 
 def create_system_message():
     """
@@ -40,8 +72,17 @@ def create_system_message():
 
     return message
 
-def generate(new_user_message, history):
+def session_id(request):
+    """
+    Identify the user for per-session limits and fair queuing.
+    """
+    if request is None:
+        return "anonymous"
+    return request.username or request.session_hash or request.client.host
+
+def generate(new_user_message, history, request: gr.Request = None):
     prompt = new_user_message
+    session = session_id(request)
 
     # full_response is displayed to the user in the ChatInterface and is the
     # same as the prompt, except it omits the Question and Result to improve
@@ -51,34 +92,73 @@ def generate(new_user_message, history):
     iters = 0
     model = MODELS["vLLM"]
 
-    try:
-        while True:
-            if verbose:
-                print("="*80)
-                print(f"ITERATION {iters}")
-                print("="*80)
-                print(prompt)
-
-            stream = model.generate(
-                system_message,
-                prompt,
-                history=history,
-                temperature=temperature
-            )
+    if not model.ready:
+        # Discovery keeps retrying in the background; answer right away rather
+        # than wait on it while holding a chat slot
+        yield NOT_READY_MESSAGE
+        return
+
+    start = time.perf_counter()
+    last_chunk = None
+    chunks = 0
+
+    # Root span of this chat in the OpenTelemetry export.  Admission wait and
+    # the first token are recorded on it, so the client-side share of a slow
+    # request can be told apart from the model.generate span under it.
+    with telemetry.request_span("chat", session=session) as request_span:
+        try:
+            with admission.admit(session, INTERACTIVE):
+                request_span.event("admitted", wait_seconds=time.perf_counter() - start)
+                while True:
+                    if verbose:
+                        print("="*80)
+                        print(f"ITERATION {iters}")
+                        print("="*80)
+                        print(prompt)
+
+                    with request_span.activate():
+                        stream = model.generate(
+                            system_message,
+                            prompt,
+                            history=history,
+                            temperature=temperature
+                        )
+
+                    for chunk in stream:
+                        completion = model.parse_completion(chunk)
+
+                        if completion:
+                            now = time.perf_counter()
+                            if last_chunk is None:
+                                telemetry.TTFT_SECONDS.observe(now - start)
+                                telemetry.record("ttft", now - start)
+                                request_span.set(ttft_seconds=now - start)
+                                request_span.event("first_token")
+                            else:
+                                telemetry.INTER_CHUNK_SECONDS.observe(now - last_chunk)
+                            last_chunk = now
+                            chunks += 1
+
+                            # Stream each completion to the ChatInterface
+                            full_response += completion
+                            yield full_response
+
+                    return
+
+        except Busy as e:
+            request_span.set(shed=str(e))
+            yield BUSY_MESSAGE
+            return
 
-            for chunk in stream:
-                completion = model.parse_completion(chunk)
+        except Exception as e:
+            telemetry.ERRORS.inc(stage="chat")
+            request_span.error(e)
+            full_response += f"\n<span style='color:red'>Error: {e}</span>"
+            yield full_response
 
-                if completion:
-                    # Stream each completion to the ChatInterface
-                    full_response += completion
-                    yield full_response
-            
-            return
-    
-    except Exception as e:
-        full_response += f"\n<span style='color:red'>Error: {e}</span>"
-        yield full_response
+        finally:
+            telemetry.REQUEST_SECONDS.observe(time.perf_counter() - start)
+            request_span.set(chunks=chunks)
 
 
 # Create Gradio app
@@ -108,7 +188,8 @@ with gr.Blocks(css=CSS) as app:
             model_name_box = gr.Textbox(
                 label="Model Name",
                 placeholder="N/A",
-                value=MODELS["vLLM"].model_name
+                # Evaluated on page load, once discovery has had a chance to finish
+                value=lambda: MODELS["vLLM"].model_name if MODELS["vLLM"].ready else "N/A"
             )
 
             base_url_box = gr.Textbox(
@@ -126,4 +207,17 @@ with gr.Blocks(css=CSS) as app:
 
     temperature_slider.change(fn=change_temperature, inputs=temperature_slider)
 
-app.queue().launch(debug=True, share=False)
+# Let the admission controller, not Gradio's per-event limit (1 by default),
+# decide how many chats reach vLLM at once.  Every chat holds a Gradio worker
+# thread while it is inside the controller, running or queued, so Gradio must
+# run more chats than the controller holds (the overflow then gets the busy
+# reply instead of waiting in Gradio's own queue) and have threads for all of
+# them plus the UI's event handlers.  Gradio's default is 40 threads.
+chat_concurrency = admission.capacity + SHED_HEADROOM
+app.queue(default_concurrency_limit=chat_concurrency).launch(
+    share=False,
+    prevent_thread_lock=True,
+    max_threads=chat_concurrency + UI_THREADS
+)
+gradio_running.set()
+app.block_thread()
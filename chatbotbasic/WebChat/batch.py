@@ -0,0 +1,374 @@
+"""
+Batch/offline inference for bulk prompt workloads (repo summaries, FAQ
+pre-answering, re-scoring).
+
+Reads prompts from a JSONL file, keeps a fixed number of requests in flight
+across one or more OpenAI-compatible endpoints, and appends each result to
+an output JSONL file as soon as it finishes.  The output file doubles as the
+checkpoint: rerunning the same command skips prompts that already have a
+result.  A resumed run appends to the file, so a prompt that failed before can
+have a failed line followed by a successful one; the last successful line per
+id wins (load_results does this).
+
+Batch traffic yields to chats: unless --no-yield is given, the number of
+requests in flight is halved whenever any endpoint's vLLM reports waiting
+requests or a KV cache above 80% full, which is well before the chat app
+starts shedding chats (see admission.py), and grows back while it is idle.
+
+Each input line is a JSON object with either "prompt" (plus an optional
+"system") or a full "messages" list, and optionally "id", "max_tokens" and
+"temperature".  Lines without an id are numbered by position, and ids must be
+unique.
+
+    python batch.py prompts.jsonl results.jsonl --max-in-flight 256
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+
+import yaml
+
+from admission import AdmissionController, BATCH
+from models import OpenAIModel, MAX_TOKENS
+
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_RETRIES = 3
+
+# vLLM load at which batch traffic backs off.  Both are below the chat app's
+# admission thresholds (vllm_max_waiting: 8, kv_cache_high: 0.9), so a bulk
+# job gives way before chats are turned away as busy.
+DEFAULT_YIELD_WAITING = 0
+DEFAULT_YIELD_KV_CACHE = 0.8
+
+
+def load_prompts(path):
+    """
+    Read prompt records from a JSONL file, filling in missing ids.  Raises
+    ValueError on a duplicate id, which would otherwise make the checkpoint
+    skip one of the prompts.
+    """
+    records = []
+    seen = {}
+    with open(path) as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault("id", i)
+            if "messages" not in record and "prompt" not in record:
+                raise ValueError(f"{path}:{i + 1}: expected a 'prompt' or 'messages' field")
+            if record["id"] in seen:
+                raise ValueError(f"{path}:{i + 1}: duplicate id {record['id']!r} (first used on line {seen[record['id']]})")
+            seen[record["id"]] = i + 1
+            records.append(record)
+    return records
+
+
+def load_results(path):
+    """
+    Return {id: result} with the last successful result for each id in the
+    output file.  Failed attempts and a partially written last line (from a
+    killed run) are ignored.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("error") is None:
+                results[result["id"]] = result
+    return results
+
+
+def load_checkpoint(path):
+    """
+    Return the ids that already have a successful result in the output file.
+    """
+    return set(load_results(path))
+
+
+def build_messages(record):
+    if "messages" in record:
+        return record["messages"]
+    messages = []
+    if record.get("system"):
+        messages.append({"role": "system", "content": record["system"]})
+    messages.append({"role": "user", "content": str(record["prompt"])})
+    return messages
+
+
+def prompt_length(record):
+    return sum(len(str(m.get("content", ""))) for m in build_messages(record))
+
+
+class EndpointPool:
+    """
+    Spread requests over several endpoints, sending each new request to the
+    one with the fewest requests in flight.
+    """
+
+    def __init__(self, base_urls, api_key, model_name=None):
+        self.models = [
+            OpenAIModel({"base_url": url, "api_key": api_key, "model_name": model_name})
+            for url in base_urls
+        ]
+        self.inflight = [0] * len(self.models)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            index = min(range(len(self.models)), key=lambda i: self.inflight[i])
+            self.inflight[index] += 1
+            return index
+
+    def release(self, index):
+        with self._lock:
+            self.inflight[index] -= 1
+
+
+def yielding_controller(base_urls, max_in_flight, max_waiting=DEFAULT_YIELD_WAITING,
+                        kv_cache_high=DEFAULT_YIELD_KV_CACHE, poll_interval=1.0):
+    """
+    Admission controller for a batch run that scrapes every endpoint's vLLM
+    /metrics and halves the batch in-flight limit, down to one request, while
+    any of them is over max_waiting or kv_cache_high.
+    """
+    controller = AdmissionController(
+        max_inflight=max_in_flight,
+        min_inflight=1,
+        max_queue=max_in_flight,
+        max_per_session=max_in_flight,
+        queue_timeout=None,
+        vllm_max_waiting=max_waiting,
+        kv_cache_high=kv_cache_high,
+    )
+    for url in base_urls:
+        controller.start_polling(url.rsplit("/v1", 1)[0] + "/metrics", poll_interval)
+    return controller
+
+
+class BatchRunner:
+    """
+    Run prompt records through an EndpointPool with at most max_in_flight
+    concurrent requests, retrying failures with exponential backoff.  If an
+    admission controller is given, each request also holds one of its BATCH
+    slots, so the run slows down when the controller's limit drops.
+    """
+
+    def __init__(self, pool, max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_tokens=MAX_TOKENS,
+                 temperature=0, retries=DEFAULT_RETRIES, admission=None):
+        self.pool = pool
+        self.max_in_flight = max_in_flight
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.retries = retries
+        self.admission = admission
+
+    def _slot(self):
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.admit(BATCH, BATCH)
+
+    def run_one(self, record):
+        messages = build_messages(record)
+        start = time.perf_counter()
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            with self._slot():
+                index = self.pool.acquire()
+                model = self.pool.models[index]
+                try:
+                    response = model.complete(
+                        messages,
+                        temperature=record.get("temperature", self.temperature),
+                        max_tokens=record.get("max_tokens", self.max_tokens),
+                    )
+                    usage = response.usage
+                    return {
+                        "id": record["id"],
+                        "output": response.choices[0].message.content,
+                        "finish_reason": response.choices[0].finish_reason,
+                        "prompt_tokens": usage.prompt_tokens if usage else None,
+                        "completion_tokens": usage.completion_tokens if usage else None,
+                        "latency": time.perf_counter() - start,
+                        "endpoint": model.config["base_url"],
+                        "error": None,
+                    }
+                except Exception as e:
+                    error = str(e)
+                finally:
+                    self.pool.release(index)
+            if attempt < self.retries:
+                time.sleep(delay)
+                delay *= 2
+
+        return {
+            "id": record["id"],
+            "output": None,
+            "latency": time.perf_counter() - start,
+            "error": error,
+        }
+
+    def run(self, records, output_path, sort_by_length=True, progress=True):
+        """
+        Process records not yet in output_path and append their results to
+        it.  Returns summary statistics for this run.
+        """
+        done = load_checkpoint(output_path)
+        pending = [r for r in records if r["id"] not in done]
+        if sort_by_length:
+            # Longest prompts first: similar lengths are scheduled together,
+            # which batches better on the server, and the slowest requests
+            # do not end up as stragglers at the end of the run.
+            pending.sort(key=prompt_length, reverse=True)
+
+        stats = {
+            "num_requests": 0,
+            "failed": 0,
+            "skipped": len(records) - len(pending),
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+        # A killed run can leave a partial last line; start on a fresh one so
+        # the next result is not glued onto it
+        if os.path.exists(output_path) and os.path.getsize(output_path):
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    with open(output_path, "a") as out:
+                        out.write("\n")
+
+        start = time.perf_counter()
+        records_left = iter(pending)
+        inflight = set()
+        completed = 0
+        with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            try:
+                while True:
+                    # Only submit up to max_in_flight requests at a time, so an
+                    # interrupted run stops sending work instead of draining
+                    # a queue of every pending prompt.
+                    while len(inflight) < self.max_in_flight:
+                        record = next(records_left, None)
+                        if record is None:
+                            break
+                        inflight.add(pool.submit(self.run_one, record))
+                    if not inflight:
+                        break
+
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        result = future.result()
+                        out.write(json.dumps(result) + "\n")
+                        out.flush()
+                        completed += 1
+
+                        if result["error"] is None:
+                            stats["num_requests"] += 1
+                            stats["prompt_tokens"] += result["prompt_tokens"] or 0
+                            stats["completion_tokens"] += result["completion_tokens"] or 0
+                        else:
+                            stats["failed"] += 1
+
+                        if progress and (completed % 100 == 0 or completed == len(pending)):
+                            print(f"{completed}/{len(pending)} done, {stats['failed']} failed")
+            except BaseException:
+                # Ctrl-C or a failed write: drop anything not yet started.
+                # Requests already running finish, but nothing new is sent.
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        elapsed = time.perf_counter() - start
+        total_tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+        # Same keys as `vllm bench throughput --output-json`, so results can be
+        # compared with bench-results/*/throughput.json directly
+        stats.update({
+            "elapsed_time": elapsed,
+            "total_num_tokens": total_tokens,
+            "requests_per_second": stats["num_requests"] / elapsed if elapsed else 0.0,
+            "tokens_per_second": total_tokens / elapsed if elapsed else 0.0,
+            "output_tokens_per_second": stats["completion_tokens"] / elapsed if elapsed else 0.0,
+        })
+        return stats
+
+
+def default_endpoint():
+    """
+    The endpoint the chat app uses, from config.yaml if present.
+    """
+    try:
+        with open("config.yaml") as f:
+            config = yaml.safe_load(f)
+        return f"http://{config.get('openstack_ip_port', '127.0.0.1:8000')}/v1"
+    except OSError:
+        return "http://127.0.0.1:8000/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through vLLM in bulk.")
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("output", help="JSONL file to append results to; also used to resume")
+    parser.add_argument("--endpoint", action="append",
+                        help="OpenAI-compatible base URL; repeat to spread load over several servers (default: config.yaml)")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", "ec528"))
+    parser.add_argument("--model", default=None, help="Model id (default: discovered from the first endpoint)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Concurrent requests across all endpoints")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Default max output tokens per prompt")
+    parser.add_argument("--temperature", type=float, default=0.0, help="Default sampling temperature")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per failed request")
+    parser.add_argument("--no-sort", action="store_true", help="Keep input order instead of sorting by prompt length")
+    parser.add_argument("--yield-waiting", type=int, default=DEFAULT_YIELD_WAITING,
+                        help="Back off while any vLLM has more waiting requests than this")
+    parser.add_argument("--yield-kv-cache", type=float, default=DEFAULT_YIELD_KV_CACHE,
+                        help="Back off while any vLLM's KV-cache usage is at or above this fraction")
+    parser.add_argument("--no-yield", action="store_true",
+                        help="Keep max-in-flight requests running regardless of vLLM load (only for a dedicated server)")
+    parser.add_argument("--result-file", default=None, help="Save throughput statistics as JSON")
+    args = parser.parse_args()
+
+    endpoints = args.endpoint or [default_endpoint()]
+    model_name = args.model
+    if model_name is None:
+        model_name = OpenAIModel({"base_url": endpoints[0], "api_key": args.api_key}).discover_model(retries=DEFAULT_RETRIES)
+
+    admission = None
+    if not args.no_yield:
+        admission = yielding_controller(endpoints, args.max_in_flight, args.yield_waiting, args.yield_kv_cache)
+
+    runner = BatchRunner(
+        EndpointPool(endpoints, args.api_key, model_name),
+        max_in_flight=args.max_in_flight,
+        max_tokens=args.max_tokens,
+        temperature=args.temperature,
+        retries=args.retries,
+        admission=admission,
+    )
+    stats = runner.run(load_prompts(args.input), args.output, sort_by_length=not args.no_sort)
+
+    print("{s:{c}^60}".format(s=" Batch Result ", c="="))
+    print("{:<40} {:<10}".format("Completed requests:", stats["num_requests"]))
+    print("{:<40} {:<10}".format("Failed requests:", stats["failed"]))
+    print("{:<40} {:<10}".format("Skipped (already done):", stats["skipped"]))
+    print("{:<40} {:<10.2f}".format("Elapsed time (s):", stats["elapsed_time"]))
+    print("{:<40} {:<10.2f}".format("Requests per second:", stats["requests_per_second"]))
+    print("{:<40} {:<10.2f}".format("Total tokens per second:", stats["tokens_per_second"]))
+    print("{:<40} {:<10.2f}".format("Output tokens per second:", stats["output_tokens_per_second"]))
+    print("=" * 60)
+
+    if args.result_file:
+        with open(args.result_file, "w") as f:
+            json.dump(stats, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
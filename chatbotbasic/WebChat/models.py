@@ -1,26 +1,86 @@
-import os
-import openai
-import anthropic
-import huggingface_hub
-import tiktoken # Tokenizer for OpenAI GPT models
-import sentencepiece # Tokenizer for LLaMA 2 model
-from openai import OpenAI
+import threading
+import time
+
+import telemetry
 
 
 MAX_TOKENS = 1000  # Max number of tokens that each model should generate
 
+DISCOVERY_BACKOFF = 0.5       # Initial delay between model discovery attempts (seconds)
+DISCOVERY_MAX_BACKOFF = 30.0  # Cap on the delay between attempts
+DISCOVERY_TIMEOUT = 5.0       # Per-attempt timeout; the SDK default of 600s would hide a hung server
+
 class Model:
     """
     Common interface for all chat model API providers
     """
     def __init__(self, config):
+        # Nothing here touches the network or imports the OpenAI SDK, so
+        # constructing a model never slows down or breaks startup.  Set
+        # model_name in the config to skip discovery altogether.
         self.config = config
-        self.client = OpenAI(
-            base_url=config.get("base_url", "http://127.0.0.1:8000/v1"),
-            api_key=config.get("api_key", "ec528")
-        )
-        self.model_name = self.client.models.list().data[0].id
-        print(f"Using model: {self.model_name}")
+        self._client = None
+        self._model_name = config.get("model_name") or None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(
+                        base_url=self.config.get("base_url", "http://127.0.0.1:8000/v1"),
+                        api_key=self.config.get("api_key", "ec528")
+                    )
+        return self._client
+
+    @property
+    def model_name(self):
+        """
+        Id of the served model, discovered on first use and cached.
+        """
+        if self._model_name is None:
+            self.discover_model(retries=1)
+        return self._model_name
+
+    @property
+    def ready(self):
+        return self._model_name is not None
+
+    def discover_model(self, retries=None):
+        """
+        Ask the server which model it serves, retrying with exponential
+        backoff.  retries=None retries until it succeeds.
+        """
+        delay = DISCOVERY_BACKOFF
+        attempt = 0
+        while self._model_name is None:
+            attempt += 1
+            try:
+                # Retries are handled here, with backoff, not by the SDK
+                client = self.client.with_options(timeout=DISCOVERY_TIMEOUT, max_retries=0)
+                with telemetry.span("model.discover"):
+                    model_name = client.models.list().data[0].id
+                self._model_name = model_name
+                print(f"Using model: {model_name}")
+            except Exception as e:
+                if retries is not None and attempt >= retries:
+                    raise
+                print(f"Model discovery failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, DISCOVERY_MAX_BACKOFF)
+        return self._model_name
+
+    def start_discovery(self):
+        """
+        Discover the model on a background thread so startup does not wait
+        on the model server.
+        """
+        thread = threading.Thread(target=self.discover_model, name="model-discovery", daemon=True)
+        thread.start()
+        return thread
 
 
     def generate(self, system_message, new_user_message, history=[], temperature=1):
@@ -32,16 +92,33 @@ class Model:
 
         messages.append({"role": "user", "content": new_user_message})
 
-        stream = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=MAX_TOKENS,
-            stream=True,
-        )
+        # Covers sending the request and waiting for the response headers;
+        # the streamed tokens themselves are timed by the caller.
+        with telemetry.span("model.generate"):
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=MAX_TOKENS,
+                stream=True,
+            )
 
         return stream
 
+    def complete(self, messages, temperature=0, max_tokens=MAX_TOKENS):
+        """
+        Non-streaming chat completion for bulk jobs (see batch.py).  Returns
+        the full response, including token usage.
+        """
+        with telemetry.span("model.complete"):
+            return self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=False,
+            )
+
     def parse_completion(self, completion):
         # ✅ works with ChatCompletionChunk
         delta = completion.choices[0].delta
@@ -64,13 +141,16 @@ class OpenAIModel(Model):
 
         messages.append({"role": "user", "content": str(new_user_message)})
 
-        stream = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=MAX_TOKENS,
-            stream=True,
-        )
+        # Covers sending the request and waiting for the response headers;
+        # the streamed tokens themselves are timed by the caller.
+        with telemetry.span("model.generate"):
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=MAX_TOKENS,
+                stream=True,
+            )
 
         return stream
     
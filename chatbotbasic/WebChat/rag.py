@@ -1,5 +1,6 @@
 # rag.py
 import os
+import time
 import tempfile
 from pathlib import Path
 from typing import Dict, List, Optional, Iterable
@@ -15,11 +16,18 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders.generic import GenericLoader
 from langchain_community.document_loaders.parsers import LanguageParser
 
+import telemetry
+
 _CACHE_DIR = Path(".rag_cache")
 _CACHE_DIR.mkdir(exist_ok=True)
 _VS_CACHE: Dict[str, FAISS] = {}
 _VS_CACHE_MERGED: Dict[tuple, FAISS] = {}
 
+# Model names can be overridden to point RAG at an OpenAI-compatible server
+# (e.g. vLLM, or the benchmark suite's stand-in endpoint via OPENAI_BASE_URL)
+_EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+_CHAT_MODEL = os.environ.get("RAG_CHAT_MODEL", "gpt-4o-mini")
+
 _SUFFIXES = [
     ".py", ".md", ".txt", ".ts", ".tsx", ".js",
     ".java", ".go", ".rs", ".cpp", ".c", ".cs",
@@ -91,31 +99,45 @@ def _load_vs(embeddings: OpenAIEmbeddings, cache_key: str) -> Optional[FAISS]:
 def _get_embeddings():
     if "OPENAI_API_KEY" not in os.environ:
         raise RuntimeError("Set OPENAI_API_KEY for embeddings and LLM.")
-    return OpenAIEmbeddings(model="text-embedding-3-small")
+    if os.environ.get("OPENAI_BASE_URL"):
+        # OpenAI-compatible servers take raw text; skip the tiktoken
+        # pre-tokenization, which also needs network access to load.
+        return OpenAIEmbeddings(model=_EMBEDDING_MODEL, check_embedding_ctx_length=False)
+    return OpenAIEmbeddings(model=_EMBEDDING_MODEL)
 
 def _vectorstore_for_repo(repo_url: str) -> FAISS:
     """
     Build or load a FAISS vectorstore for a single repo.
     Cached in-memory and on-disk per commit.
     """
+    telemetry.record_cache("rag_memory", repo_url in _VS_CACHE)
     if repo_url in _VS_CACHE:
         return _VS_CACHE[repo_url]
 
     embeddings = _get_embeddings()
 
-    repo_dir = _clone_repo(repo_url)
+    with telemetry.span("rag.clone"):
+        repo_dir = _clone_repo(repo_url)
     head = _get_head_commit(repo_dir)
     cache_key = _repo_key(repo_url, head)
 
-    cached_vs = _load_vs(embeddings, cache_key)
+    with telemetry.span("rag.load_index"):
+        cached_vs = _load_vs(embeddings, cache_key)
+    telemetry.record_cache("rag_disk", cached_vs is not None)
     if cached_vs:
         _VS_CACHE[repo_url] = cached_vs
         return cached_vs
 
-    docs = _load_repo_docs(repo_dir)
-    chunks = _chunk_docs(docs)
-    vs = FAISS.from_documents(chunks, embeddings)
-    _save_vs(vs, cache_key)
+    with telemetry.span("rag.load_docs"):
+        docs = _load_repo_docs(repo_dir)
+    with telemetry.span("rag.chunk"):
+        chunks = _chunk_docs(docs)
+    # from_documents embeds every chunk and builds the index in one call;
+    # the embedding requests dominate its runtime.
+    with telemetry.span("rag.embed"):
+        vs = FAISS.from_documents(chunks, embeddings)
+    with telemetry.span("rag.save_index"):
+        _save_vs(vs, cache_key)
     _VS_CACHE[repo_url] = vs
     return vs
 
@@ -132,14 +154,16 @@ def build_retriever_for_repos(repo_urls: Iterable[str]):
     if not repo_urls:
         raise ValueError("No repositories provided.")
 
+    telemetry.record_cache("rag_merged", repo_urls in _VS_CACHE_MERGED)
     if repo_urls in _VS_CACHE_MERGED:
         return _VS_CACHE_MERGED[repo_urls].as_retriever(search_kwargs={"k": 6})
 
     # Build / load individual vectorstores
     vs_list: List[FAISS] = [_vectorstore_for_repo(u) for u in repo_urls]
     base = vs_list[0]
-    for other in vs_list[1:]:
-        base.merge_from(other)
+    with telemetry.span("rag.merge"):
+        for other in vs_list[1:]:
+            base.merge_from(other)
 
     _VS_CACHE_MERGED[repo_urls] = base
     return base.as_retriever(search_kwargs={"k": 6})
@@ -153,25 +177,44 @@ def rag_answer_multi(repo_urls: List[str], question: str, chat_history=None) ->
     return _rag_ask_with_retriever(retriever, question, repo_hint=", ".join(repo_urls))
 
 def _rag_ask_with_retriever(retriever, question: str, repo_hint: str = "") -> str:
-    relevant_docs = retriever.get_relevant_documents(question)
+    # Equivalent to retriever.get_relevant_documents(question), split so the
+    # query embedding and the index search are timed separately.
+    vs = retriever.vectorstore
+    with telemetry.span("rag.embed_query"):
+        query_vector = vs.embeddings.embed_query(question)
+    with telemetry.span("rag.search"):
+        relevant_docs = vs.similarity_search_by_vector(query_vector, **retriever.search_kwargs)
 
     system = (
         "You are a helpful software assistant. Rely on the provided repository context. "
         "Cite filenames/paths from metadata when helpful. If unsure, say you’re unsure."
     )
 
-    context_blocks = []
-    for d in relevant_docs:
-        path = d.metadata.get("repo_path") or d.metadata.get("source", "")
-        context_blocks.append(f"[{path}]\n{d.page_content}")
+    with telemetry.span("rag.context"):
+        context_blocks = []
+        for d in relevant_docs:
+            path = d.metadata.get("repo_path") or d.metadata.get("source", "")
+            context_blocks.append(f"[{path}]\n{d.page_content}")
 
-    context = "\n\n---\n\n".join(context_blocks) if context_blocks else "No relevant repo context found."
+        context = "\n\n---\n\n".join(context_blocks) if context_blocks else "No relevant repo context found."
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", system),
         ("human", "Repos: {repo_hint}\n\nQuestion: {question}\n\nContext:\n{context}")
     ])
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-    resp = (prompt | llm).invoke({"repo_hint": repo_hint, "question": question, "context": context})
-    return resp.content
+    llm = ChatOpenAI(model=_CHAT_MODEL, temperature=0.2)
+
+    # Stream the answer so time to first token (prefill) and the rest of the
+    # generation (decode) can be reported separately.
+    start = time.perf_counter()
+    first_token = None
+    parts = []
+    for chunk in (prompt | llm).stream({"repo_hint": repo_hint, "question": question, "context": context}):
+        if first_token is None:
+            first_token = time.perf_counter()
+            telemetry.observe_stage("rag.prefill", first_token - start)
+        parts.append(chunk.content)
+    if first_token is not None:
+        telemetry.observe_stage("rag.decode", time.perf_counter() - first_token)
+    return "".join(parts)
@@ -0,0 +1,372 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds.  Spans range from sub-millisecond cache lookups
+# to multi-minute repo clones, so the buckets cover both ends.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+_REGISTRY = []
+_READINESS_CHECKS = {}
+_local = threading.local()
+_tracer = None
+_otel_trace = None  # the opentelemetry.trace module, once export is enabled
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in Prometheus format.
+    """
+
+    def __init__(self, name, doc):
+        self.name = name
+        self.doc = doc
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time value with optional labels, rendered in Prometheus format.
+    """
+
+    def __init__(self, name, doc):
+        self.name = name
+        self.doc = doc
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels, rendered in Prometheus format.
+    Observations only touch one bucket counter, so recording is cheap enough
+    to use on every streamed chunk.
+    """
+
+    def __init__(self, name, doc, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus the +Inf overflow, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+# Metrics recorded by the WebChat app
+REQUEST_SECONDS = Histogram("webchat_request_seconds", "End-to-end latency of a chat request")
+TTFT_SECONDS = Histogram("webchat_ttft_seconds", "Time from chat request to first streamed token")
+INTER_CHUNK_SECONDS = Histogram(
+    "webchat_inter_chunk_seconds", "Gap between consecutive streamed chunks",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64, 1.28, 2.56)
+)
+STAGE_SECONDS = Histogram("webchat_stage_seconds", "Latency of an instrumented pipeline stage")
+TOOL_SECONDS = Histogram("webchat_tool_seconds", "Latency of an LLM tool call")
+CACHE_LOOKUPS = Counter("webchat_cache_lookups_total", "Cache lookups by cache and result (hit/miss)")
+ERRORS = Counter("webchat_errors_total", "Errors raised inside an instrumented stage")
+
+# Admission control (see admission.py)
+ADMISSION_INFLIGHT = Gauge("webchat_admission_inflight", "Requests currently admitted to the model server")
+ADMISSION_LIMIT = Gauge("webchat_admission_limit", "Current in-flight limit derived from vLLM load")
+ADMISSION_QUEUED = Gauge("webchat_admission_queued", "Requests waiting for admission by priority class")
+ADMISSION_WAIT_SECONDS = Histogram("webchat_admission_wait_seconds", "Time spent waiting for admission")
+ADMISSION_SHED = Counter("webchat_admission_shed_total", "Requests rejected as busy by reason and priority class")
+
+
+@contextmanager
+def span(name, metric=None, **labels):
+    """
+    Time the enclosed block.  By default the duration is recorded in
+    webchat_stage_seconds{stage=name}; pass metric to record into another
+    histogram using the given labels instead.  The span is also exported to
+    OpenTelemetry when enabled and added to the active trace, if any.
+    """
+    otel = _tracer.start_as_current_span(name, attributes=labels) if _tracer else None
+    if otel:
+        otel.__enter__()
+    start = time.perf_counter()
+    exc_info = (None, None, None)
+    try:
+        yield
+    except Exception as e:
+        ERRORS.inc(stage=name)
+        exc_info = (type(e), e, e.__traceback__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if metric is None:
+            observe_stage(name, elapsed)
+        else:
+            metric.observe(elapsed, **labels)
+            record(name, elapsed)
+        if otel:
+            # Passing the exception marks the span as failed
+            otel.__exit__(*exc_info)
+
+
+class _RequestSpan:
+    """
+    Handle on a request-level OpenTelemetry span; every method is a no-op
+    when export is disabled.
+    """
+
+    def __init__(self, otel_span):
+        self._span = otel_span
+
+    def set(self, **attributes):
+        if self._span:
+            self._span.set_attributes(attributes)
+
+    def event(self, name, **attributes):
+        if self._span:
+            self._span.add_event(name, attributes)
+
+    def error(self, e):
+        """
+        Mark the request as failed, for errors the caller handles itself.
+        """
+        if self._span:
+            self._span.record_exception(e)
+            self._span.set_status(_otel_trace.Status(_otel_trace.StatusCode.ERROR, str(e)))
+
+    @contextmanager
+    def activate(self):
+        """
+        Make this the parent of spans started inside the block.  The block
+        must not yield: Gradio resumes a generator on a different worker
+        thread and context each time, so the parent is set per block rather
+        than for the whole request.
+        """
+        if self._span is None:
+            yield
+            return
+        with _otel_trace.use_span(self._span, end_on_exit=False):
+            yield
+
+
+@contextmanager
+def request_span(name, **attributes):
+    """
+    Open the root OpenTelemetry span of one request, e.g. a chat, and yield a
+    _RequestSpan for adding events (first token, ...) and parenting the
+    stage spans.  Unlike span(), the root span is never made current, so it
+    can stay open across the yields of a streaming generator.
+    """
+    otel_span = _tracer.start_span(name, attributes=attributes) if _tracer else None
+    request = _RequestSpan(otel_span)
+    try:
+        yield request
+    except Exception as e:
+        request.error(e)
+        raise
+    finally:
+        if otel_span:
+            otel_span.end()
+
+
+def observe_stage(name, elapsed):
+    """
+    Record a stage duration that was measured by hand, e.g. the prefill part
+    of a streamed response, which does not map onto a single block.
+    """
+    STAGE_SECONDS.observe(elapsed, stage=name)
+    record(name, elapsed)
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record(name, elapsed):
+    """
+    Add a duration to the trace collected on this thread, if any, without
+    recording it in a histogram.
+    """
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans.append((name, elapsed))
+
+
+@contextmanager
+def trace():
+    """
+    Collect every span finished on this thread inside the block.  Yields a list
+    of (name, seconds) tuples, which lets callers such as the benchmark suite
+    break down a single request by stage.
+    """
+    previous = getattr(_local, "spans", None)
+    spans = _local.spans = []
+    try:
+        yield spans
+    finally:
+        _local.spans = previous
+
+
+def render_metrics():
+    """
+    Return all registered metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def add_readiness_check(name, check):
+    """
+    Register a callable that returns True once the app can serve traffic.
+    /readyz succeeds only when every registered check passes.
+    """
+    _READINESS_CHECKS[name] = check
+
+
+def readiness():
+    """
+    Return (ready, {check name: passed}).  The app is not ready until at
+    least one check has been registered.
+    """
+    results = {}
+    for name, check in list(_READINESS_CHECKS.items()):
+        try:
+            results[name] = bool(check())
+        except Exception:
+            results[name] = False
+    return bool(results) and all(results.values()), results
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._send(200, render_metrics(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/healthz":
+            # Liveness: the process is up and serving this thread
+            self._send(200, "ok\n")
+        elif path == "/readyz":
+            ready, results = readiness()
+            body = "".join(f"{name} {'ok' if passed else 'pending'}\n" for name, passed in results.items())
+            self._send(200 if ready else 503, body)
+        else:
+            self.send_error(404)
+
+    def _send(self, status, text, content_type="text/plain; charset=utf-8"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Prometheus scrapes every few seconds; keep them out of the app log
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve /metrics, /healthz (liveness) and /readyz (readiness) from a
+    background thread so scrapes and probes never wait on the Gradio queue.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+def enable_otel(endpoint, service_name="webchat"):
+    """
+    Export spans to an OTLP/HTTP collector.  OpenTelemetry is optional; if it
+    is not installed the Prometheus metrics keep working on their own.
+    """
+    global _tracer, _otel_trace
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OpenTelemetry is not installed; span export disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    otel_trace.set_tracer_provider(provider)
+    _tracer = otel_trace.get_tracer(service_name)
+    _otel_trace = otel_trace
+    return True
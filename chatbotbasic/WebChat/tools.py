@@ -3,9 +3,10 @@ import re
 import urllib.parse
 from bs4 import BeautifulSoup
 import requests
-from selenium import webdriver
 from util import safe_eval, distill_html
 
+import telemetry
+
 class Tools:
     """
     Tools that can be used by an LLM
@@ -74,7 +75,8 @@ class Tools:
         # The LLM sometimes puts double quotes around the param
         params = params.strip('"')
 
-        result = tool["func"](params)
+        with telemetry.span("tool", telemetry.TOOL_SECONDS, tool=name):
+            result = tool["func"](params)
 
         return result
 
@@ -91,6 +93,9 @@ class Tools:
         self.webdriver = None
 
     def create_webdriver(self):
+        # Selenium is only needed once a page is actually fetched in a browser
+        from selenium import webdriver
+
         return webdriver.Chrome()
 
     def get_url(self, url):
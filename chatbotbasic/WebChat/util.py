@@ -2,6 +2,8 @@ import re
 import math
 from bs4 import BeautifulSoup, Comment
 
+import telemetry
+
 def safe_eval(expression):
     """
     A version of eval() that only allows a limited set of math functions.
@@ -27,6 +29,10 @@ def distill_html(raw_html, remove_links=False):
     Reduce HTML to the minimal tags necessary to understand the content.
     Set remove_links=True to also replace <a> tags with their inner content.
     """
+    with telemetry.span("distill_html"):
+        return _distill_html(raw_html, remove_links)
+
+def _distill_html(raw_html, remove_links):
     soup = BeautifulSoup(raw_html, 'html.parser')
 
     # Tags (with inner content) that should be completely removed from the HTML
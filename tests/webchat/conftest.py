@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The WebChat modules import each other as top-level modules (e.g. "import
+# telemetry"), the same way they do when app.py is run from its directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "chatbotbasic" / "WebChat"))
@@ -0,0 +1,228 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import AdmissionController, Busy, BATCH, INTERACTIVE, RAG_INDEX, parse_vllm_metrics
+
+# Trimmed from a real vLLM /metrics scrape (V1 engine)
+VLLM_V1_METRICS = """\
+# HELP vllm:num_requests_running Number of requests in model execution batches.
+# TYPE vllm:num_requests_running gauge
+vllm:num_requests_running{engine="0",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 48.0
+# HELP vllm:num_requests_waiting Number of requests waiting to be processed.
+# TYPE vllm:num_requests_waiting gauge
+vllm:num_requests_waiting{engine="0",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 12.0
+# HELP vllm:kv_cache_usage_perc KV-cache usage. 1 means 100 percent usage.
+# TYPE vllm:kv_cache_usage_perc gauge
+vllm:kv_cache_usage_perc{engine="0",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 0.8734
+# HELP vllm:prompt_tokens_total Number of prefill tokens processed.
+# TYPE vllm:prompt_tokens_total counter
+vllm:prompt_tokens_total{engine="0",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 556990.0
+# HELP vllm:time_to_first_token_seconds Histogram of time to first token in seconds.
+# TYPE vllm:time_to_first_token_seconds histogram
+vllm:time_to_first_token_seconds_bucket{engine="0",le="0.001",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 0.0
+vllm:time_to_first_token_seconds_bucket{engine="0",le="+Inf",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 1024.0
+vllm:time_to_first_token_seconds_count{engine="0",model_name="Qwen/Qwen1.5-MoE-A2.7B-Chat"} 1024.0
+"""
+
+# Older V0 engines report the KV cache as gpu_cache_usage_perc, one series
+# per engine when running data parallel
+VLLM_V0_METRICS = """\
+# TYPE vllm:num_requests_waiting gauge
+vllm:num_requests_waiting{model_name="meta-llama/Meta-Llama-3-8B-Instruct"} 3.0
+vllm:num_requests_waiting{model_name="meta-llama/Meta-Llama-3-8B-Instruct"} 2.0
+# TYPE vllm:gpu_cache_usage_perc gauge
+vllm:gpu_cache_usage_perc{model_name="meta-llama/Meta-Llama-3-8B-Instruct"} 0.42
+vllm:gpu_cache_usage_perc{model_name="meta-llama/Meta-Llama-3-8B-Instruct"} 0.95
+"""
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        time.sleep(0.001)
+
+
+class Holder:
+    """
+    Holds one admission slot on a background thread until released.
+    """
+
+    def __init__(self, controller, session="holder"):
+        self.release = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(controller, session))
+        self.thread.start()
+        wait_until(lambda: controller.inflight == 1)
+
+    def _run(self, controller, session):
+        with controller.admit(session):
+            self.release.wait()
+
+    def stop(self):
+        self.release.set()
+        self.thread.join()
+
+
+def test_dispatch_order_follows_weights():
+    controller = AdmissionController(max_inflight=1, min_inflight=1, max_per_session=10)
+    holder = Holder(controller)
+
+    order = []
+    threads = []
+    arrivals = [
+        ("heavy", BATCH, "b0"),
+        ("heavy", BATCH, "b1"),
+        ("heavy", BATCH, "b2"),
+        ("indexer", RAG_INDEX, "r0"),
+        ("alice", INTERACTIVE, "i0"),
+        ("bob", INTERACTIVE, "i1"),
+        ("alice", INTERACTIVE, "i2"),
+    ]
+
+    def job(session, priority, name):
+        with controller.admit(session, priority):
+            order.append(name)
+
+    # Enqueue one at a time so the arrival order is deterministic
+    for i, args in enumerate(arrivals, 1):
+        thread = threading.Thread(target=job, args=args)
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: controller._queued == i)
+
+    holder.stop()
+    for thread in threads:
+        thread.join()
+
+    # Tags: i0=i1=0.125, i2=0.25, r0=0.5, b0=1, b1=2, b2=3
+    assert order == ["i0", "i1", "i2", "r0", "b0", "b1", "b2"]
+    assert controller.inflight == 0
+    assert controller._queued == 0
+    assert controller._sessions == {}
+
+
+def test_timeout_sheds_and_cleans_up():
+    controller = AdmissionController(max_inflight=1, min_inflight=1, queue_timeout=0.05)
+    holder = Holder(controller)
+
+    with pytest.raises(Busy, match="timeout"):
+        with controller.admit("late"):
+            pass
+
+    assert controller._queued == 0
+    assert controller._sessions == {"holder": 1}
+
+    holder.stop()
+    assert controller.inflight == 0
+    assert controller._sessions == {}
+
+    # The cancelled waiter must not take the slot once it frees up
+    with controller.admit("next"):
+        assert controller.inflight == 1
+
+
+def test_session_limit():
+    controller = AdmissionController(max_per_session=1)
+
+    with controller.admit("alice"):
+        with pytest.raises(Busy, match="session_limit"):
+            with controller.admit("alice"):
+                pass
+        with controller.admit("bob"):
+            assert controller.inflight == 2
+
+    assert controller._sessions == {}
+
+
+def test_queue_full():
+    controller = AdmissionController(max_inflight=1, min_inflight=1, max_queue=0)
+    holder = Holder(controller)
+
+    with pytest.raises(Busy, match="queue_full"):
+        with controller.admit("other"):
+            pass
+
+    holder.stop()
+
+
+def test_update_load_halves_on_overload_and_grows_by_one():
+    controller = AdmissionController(max_inflight=32, min_inflight=4, vllm_max_waiting=8, kv_cache_high=0.9)
+
+    controller.update_load(waiting=20, kv_usage=0.1)
+    assert controller.limit == 16
+    controller.update_load(waiting=0, kv_usage=0.95)
+    assert controller.limit == 8
+    controller.update_load(waiting=100, kv_usage=1.0)
+    controller.update_load(waiting=100, kv_usage=1.0)
+    assert controller.limit == 4  # never below min_inflight
+
+    controller.update_load(waiting=0, kv_usage=0.1)
+    assert controller.limit == 5
+    controller.update_load(waiting=None, kv_usage=None)  # metrics missing
+    assert controller.limit == 6
+
+    for _ in range(100):
+        controller.update_load(waiting=0, kv_usage=0.0)
+    assert controller.limit == 32  # never above max_inflight
+
+
+def test_raising_the_limit_dispatches_queued_requests():
+    controller = AdmissionController(max_inflight=2, min_inflight=1)
+    controller.update_load(waiting=100, kv_usage=None)
+    assert controller.limit == 1
+
+    holder = Holder(controller)
+    admitted = threading.Event()
+
+    def job():
+        with controller.admit("other"):
+            admitted.set()
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    wait_until(lambda: controller._queued == 1)
+
+    controller.update_load(waiting=0, kv_usage=0.0)
+    assert admitted.wait(2)
+
+    thread.join()
+    holder.stop()
+
+
+def test_parse_vllm_v1_metrics():
+    assert parse_vllm_metrics(VLLM_V1_METRICS) == (12.0, 0.8734)
+
+
+def test_parse_vllm_v0_metrics_combines_engines():
+    # Waiting requests are summed; the fullest KV cache is reported
+    assert parse_vllm_metrics(VLLM_V0_METRICS) == (5.0, 0.95)
+
+
+def test_parse_vllm_metrics_missing():
+    assert parse_vllm_metrics("# nothing here\n") == (None, None)
+
+
+def test_overflow_is_shed_through_a_server_thread_pool():
+    # Stands in for Gradio: each chat runs on a worker thread of a pool sized
+    # from controller.capacity, as app.py sizes Gradio's max_threads
+    controller = AdmissionController(max_inflight=2, min_inflight=1, max_queue=3, queue_timeout=5)
+    release = threading.Event()
+
+    def chat(session):
+        with controller.admit(session):
+            release.wait()
+
+    with ThreadPoolExecutor(max_workers=controller.capacity + 1) as pool:
+        held = [pool.submit(chat, f"user{i}") for i in range(controller.capacity)]
+        wait_until(lambda: controller.inflight == 2 and controller._queued == 3)
+
+        overflow = pool.submit(chat, "late")
+        with pytest.raises(Busy, match="queue_full"):
+            overflow.result(timeout=1)
+
+        release.set()
+        for future in held:
+            future.result(timeout=2)
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from admission import AdmissionController
+from batch import BatchRunner, load_checkpoint, load_prompts, load_results
+
+
+class FakeModel:
+    """
+    Stands in for OpenAIModel.complete; optionally raises KeyboardInterrupt
+    on the interrupt_at-th call, as if Ctrl-C hit the run.
+    """
+
+    def __init__(self, interrupt_at=None):
+        self.config = {"base_url": "http://fake/v1"}
+        self.calls = []
+        self.interrupt_at = interrupt_at
+        self._lock = threading.Lock()
+
+    def complete(self, messages, temperature=0, max_tokens=None):
+        with self._lock:
+            self.calls.append(messages[-1]["content"])
+            if self.interrupt_at is not None and len(self.calls) == self.interrupt_at:
+                raise KeyboardInterrupt
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+        )
+
+
+class FakePool:
+    def __init__(self, model):
+        self.models = [model]
+
+    def acquire(self):
+        return 0
+
+    def release(self, index):
+        pass
+
+
+def records(n):
+    return [{"id": i, "prompt": f"prompt {i} " + "x" * i} for i in range(n)]
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_interrupted_run_stops_sending_and_resumes(tmp_path):
+    output = tmp_path / "results.jsonl"
+    max_in_flight = 4
+
+    interrupted = FakeModel(interrupt_at=10)
+    runner = BatchRunner(FakePool(interrupted), max_in_flight=max_in_flight, retries=0)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(records(200), str(output), progress=False)
+
+    written = read_results(output)
+    # Only the requests already in flight may still be sent after the
+    # interrupt, not the other ~190 pending prompts
+    assert len(interrupted.calls) <= len(written) + max_in_flight + 1
+    assert len(interrupted.calls) < 20
+
+    resumed = FakeModel()
+    stats = BatchRunner(FakePool(resumed), max_in_flight=max_in_flight, retries=0).run(
+        records(200), str(output), progress=False
+    )
+
+    assert stats["skipped"] == len(written)
+    assert len(resumed.calls) == 200 - len(written)
+    assert stats["num_requests"] == 200 - len(written)
+
+    results = read_results(output)
+    assert sorted(r["id"] for r in results) == list(range(200))
+    assert load_checkpoint(str(output)) == set(range(200))
+
+
+def test_failed_requests_are_retried_on_resume(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"id": 0, "output": "ok", "error": None}) + "\n" +
+        json.dumps({"id": 1, "output": None, "error": "timeout"}) + "\n" +
+        '{"id": 2, "outp'  # cut off by a killed run
+    )
+
+    model = FakeModel()
+    stats = BatchRunner(FakePool(model), retries=0).run(records(3), str(output), progress=False)
+
+    assert stats["skipped"] == 1
+    assert len(model.calls) == 2
+    assert load_checkpoint(str(output)) == {0, 1, 2}
+
+    # The failed line for id 1 stays in the file; the successful one wins
+    assert output.read_text().count('"id": 1,') == 2
+    assert {i: r["output"] for i, r in load_results(str(output)).items()} == {0: "ok", 1: "ok", 2: "ok"}
+
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text(
+        json.dumps({"prompt": "first"}) + "\n" +      # numbered 0
+        json.dumps({"prompt": "second"}) + "\n" +     # numbered 1
+        json.dumps({"id": 0, "prompt": "third"}) + "\n"
+    )
+
+    with pytest.raises(ValueError, match="duplicate id 0"):
+        load_prompts(str(prompts))
+
+
+def test_longest_prompts_are_sent_first(tmp_path):
+    model = FakeModel()
+    BatchRunner(FakePool(model), max_in_flight=1, retries=0).run(
+        records(5), str(tmp_path / "results.jsonl"), progress=False
+    )
+
+    assert [len(c) for c in model.calls] == sorted((len(c) for c in model.calls), reverse=True)
+
+
+class SlowModel(FakeModel):
+    """
+    Tracks the most requests it was serving at once.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.peak = 0
+
+    def complete(self, messages, temperature=0, max_tokens=None):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.005)
+        with self._lock:
+            self.running -= 1
+        return super().complete(messages, temperature, max_tokens)
+
+
+def test_batch_backs_off_when_vllm_is_loaded(tmp_path):
+    admission = AdmissionController(max_inflight=8, min_inflight=1, max_queue=8, max_per_session=8,
+                                    queue_timeout=None, vllm_max_waiting=0)
+    for _ in range(3):
+        admission.update_load(waiting=5, kv_usage=0.5)  # chats are queueing in vLLM
+    assert admission.limit == 1
+
+    model = SlowModel()
+    stats = BatchRunner(FakePool(model), max_in_flight=8, retries=0, admission=admission).run(
+        records(20), str(tmp_path / "results.jsonl"), progress=False
+    )
+
+    assert stats["num_requests"] == 20
+    assert model.peak == 1
+    assert admission.inflight == 0
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+import models
+from models import OpenAIModel
+
+
+class FakeClient:
+    """
+    Records the options discovery is called with; fails the first `failures`
+    calls to models.list().
+    """
+
+    def __init__(self, failures=0):
+        self.options = []
+        self.failures = failures
+        self.models = self
+
+    def with_options(self, **options):
+        self.options.append(options)
+        return self
+
+    def list(self):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("no answer")
+        return SimpleNamespace(data=[SimpleNamespace(id="served-model")])
+
+
+def make_model(client):
+    model = OpenAIModel({"base_url": "http://fake/v1"})
+    model._client = client
+    return model
+
+
+def test_discovery_uses_a_short_timeout_without_sdk_retries():
+    client = FakeClient()
+    model = make_model(client)
+
+    assert not model.ready
+    assert model.discover_model(retries=1) == "served-model"
+    assert model.ready
+    assert client.options == [{"timeout": models.DISCOVERY_TIMEOUT, "max_retries": 0}]
+
+
+def test_discovery_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(models.time, "sleep", lambda seconds: None)
+    model = make_model(FakeClient(failures=5))
+
+    with pytest.raises(TimeoutError):
+        model.discover_model(retries=3)
+    assert not model.ready
+    assert model.discover_model() == "served-model"
+
+
+def test_configured_model_name_skips_discovery():
+    model = OpenAIModel({"model_name": "configured"})
+    assert model.ready
+    assert model.model_name == "configured"
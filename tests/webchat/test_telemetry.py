@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+
+import telemetry
+
+
+def test_counter_exposition():
+    counter = telemetry.Counter("test_lookups_total", "Test lookups")
+    counter.inc(cache="rag", result="hit")
+    counter.inc(2, cache="rag", result="hit")
+    counter.inc(cache="rag", result="miss")
+
+    assert counter.render() == [
+        "# HELP test_lookups_total Test lookups",
+        "# TYPE test_lookups_total counter",
+        'test_lookups_total{cache="rag",result="hit"} 3',
+        'test_lookups_total{cache="rag",result="miss"} 1',
+    ]
+
+
+def test_gauge_exposition():
+    gauge = telemetry.Gauge("test_queued", "Test queue")
+    gauge.set(5)
+    gauge.inc(priority="batch")
+    gauge.inc(priority="batch")
+    gauge.dec(priority="batch")
+
+    assert gauge.render()[2:] == [
+        "test_queued 5",
+        'test_queued{priority="batch"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = telemetry.Histogram("test_seconds", "Test latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.1, stage="a")   # bucket bounds are inclusive
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stage="a",le="0.1"} 2',
+        'test_seconds_bucket{stage="a",le="1.0"} 3',
+        'test_seconds_bucket{stage="a",le="+Inf"} 4',
+        'test_seconds_sum{stage="a"} 5.65',
+        'test_seconds_count{stage="a"} 4',
+    ]
+
+
+def test_registered_metrics_are_rendered():
+    text = telemetry.render_metrics()
+    assert "# TYPE webchat_ttft_seconds histogram" in text
+    assert "# TYPE webchat_cache_lookups_total counter" in text
+    assert text.endswith("\n")
+
+
+def test_span_records_stage_and_trace():
+    with telemetry.trace() as spans:
+        with telemetry.span("test.stage"):
+            pass
+
+    assert [name for name, _ in spans] == ["test.stage"]
+    assert 'webchat_stage_seconds_count{stage="test.stage"} 1' in telemetry.render_metrics()
+
+
+def test_span_counts_errors_but_not_generator_exit():
+    with pytest.raises(ValueError):
+        with telemetry.span("test.failing"):
+            raise ValueError("boom")
+
+    def stream():
+        with telemetry.span("test.stream"):
+            yield 1
+            yield 2
+
+    gen = stream()
+    next(gen)
+    gen.close()  # raises GeneratorExit inside the span
+
+    text = telemetry.render_metrics()
+    assert 'webchat_errors_total{stage="test.failing"} 1' in text
+    assert 'webchat_errors_total{stage="test.stream"}' not in text
+
+
+def test_not_ready_without_checks(monkeypatch):
+    monkeypatch.setattr(telemetry, "_READINESS_CHECKS", {})
+    assert telemetry.readiness() == (False, {})
+
+
+def test_ready_only_when_every_check_passes(monkeypatch):
+    monkeypatch.setattr(telemetry, "_READINESS_CHECKS", {})
+    gradio_running = []
+
+    telemetry.add_readiness_check("gradio", lambda: bool(gradio_running))
+    telemetry.add_readiness_check("model", lambda: True)
+    assert telemetry.readiness() == (False, {"gradio": False, "model": True})
+
+    gradio_running.append(True)
+    assert telemetry.readiness() == (True, {"gradio": True, "model": True})
+
+
+def test_failing_check_is_not_ready(monkeypatch):
+    monkeypatch.setattr(telemetry, "_READINESS_CHECKS", {})
+
+    def broken():
+        raise RuntimeError("no server")
+
+    telemetry.add_readiness_check("model", broken)
+    assert telemetry.readiness() == (False, {"model": False})
+
+
+def test_request_span_is_a_noop_without_otel():
+    with telemetry.request_span("chat", session="alice") as request:
+        request.set(ttft_seconds=0.1)
+        request.event("first_token")
+        with request.activate():
+            with telemetry.span("test.child"):
+                pass
+
+
+def test_request_span_parents_stages_across_threads(monkeypatch):
+    otel_trace = pytest.importorskip("opentelemetry.trace")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(telemetry, "_tracer", provider.get_tracer("test"))
+    monkeypatch.setattr(telemetry, "_otel_trace", otel_trace)
+
+    def chat():
+        with telemetry.request_span("chat", session="alice") as request:
+            with request.activate():
+                with telemetry.span("model.generate"):
+                    pass
+            yield
+            request.set(ttft_seconds=0.25)
+            request.event("first_token")
+            yield
+
+    # Gradio resumes the generator on a different worker thread each time
+    gen = chat()
+    for _ in range(3):
+        thread = threading.Thread(target=next, args=(gen, None))
+        thread.start()
+        thread.join()
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert spans["model.generate"].parent.span_id == spans["chat"].context.span_id
+    assert spans["chat"].parent is None
+    assert spans["chat"].attributes["ttft_seconds"] == 0.25
+    assert [e.name for e in spans["chat"].events] == ["first_token"]